@@ -6,12 +6,16 @@ import sqlite3
 import uuid
 import hashlib
 import time
-import difflib
-from difflib import SequenceMatcher
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dateutil import tz
 import os
-from PIL import Image
+import threading
+import queue
+import functools
+import weakref
+from bisect import bisect_right
+from contextlib import contextmanager
+from PIL import Image, ImageOps
 from io import BytesIO
 from email.message import EmailMessage
 import smtplib
@@ -22,6 +26,10 @@ import smtplib
 APP_NAME = "SpendSense"
 DB_FILE = "spendsense.db"
 UPLOAD_DIR = "uploads"
+MAX_IMAGE_SIZE = (1280, 1280)
+THUMB_SIZE = (400, 400)  # post-card image column is ~1/5 of a wide layout
+POSTS_PAGE_SIZE = 10
+SWEEP_INTERVAL_S = 10  # min seconds between overdue-post sweeps per session
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 BADGES = [
@@ -30,21 +38,126 @@ BADGES = [
     (20000, "Budget Pro"),
     (50000, "Frugal Master"),
 ]
+_BADGE_THR = tuple(thr for thr, _ in BADGES)
+_BADGE_NAME = tuple(name for _, name in BADGES)
 
 st.set_page_config(page_title=f"{APP_NAME} – Social Decision App", page_icon="🛑🛒", layout="wide")
 
 # ----------------------------
 # DB helpers & init
 # ----------------------------
-def get_conn():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+# Pooled connections: opening one per rerun re-pays file open, pager setup
+# and the PRAGMAs below. Streamlit runs every rerun in a fresh script thread,
+# so a thread checks a connection out on first use and its lease hands it
+# back to the pool when the thread ends. A connection is only ever used by
+# one thread at a time (transactions are per connection). The pool and the
+# leases live in st.cache_resource because this file re-executes each rerun.
+@st.cache_resource
+def _conn_pool():
+    return queue.Queue()
+
+@st.cache_resource
+def _conn_leases():
+    return threading.local()
+
+def _release_conn(pool, conn):
+    # an open transaction must not reach the next rerun, which would join it
+    if conn.in_transaction:
+        try:
+            conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            conn.close()
+            return
+    pool.put(conn)
+
+class _ConnLease:
+    """A pooled connection held by one script thread; returned when it exits."""
+    def __init__(self, pool, conn):
+        self.conn = conn
+        # runs when the thread's locals are dropped, i.e. when the rerun ends
+        weakref.finalize(self, _release_conn, pool, conn)
+
+def _open_conn():
+    conn = sqlite3.connect(
+        DB_FILE, check_same_thread=False, isolation_level=None, cached_statements=256
+    )
     conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    # per-connection settings; journal_mode=WAL is persisted by init_db()
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA cache_size=-20000")
+    # read pages straight from the OS page cache instead of copying them
+    cur.execute("PRAGMA mmap_size=268435456")
     return conn
 
+def get_conn():
+    tls = _conn_leases()
+    lease = getattr(tls, "lease", None)
+    if lease is None:
+        pool = _conn_pool()
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = _open_conn()
+        lease = tls.lease = _ConnLease(pool, conn)
+    return lease.conn
+
+@contextmanager
+def transaction():
+    """
+    Run a group of writes as one SQLite transaction (a single WAL commit).
+    Nested use joins the outer transaction instead of opening a new one.
+    """
+    conn = get_conn()
+    if conn.in_transaction:
+        yield conn.cursor()
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+        conn.execute("COMMIT")
+    except BaseException:
+        # a failed COMMIT leaves the transaction open; never leave it for the
+        # next caller to "join" (the original error is the one worth raising)
+        if conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+        raise
+
+# SQLite builds before 3.32 cap bound parameters per statement at 999
+_MAX_SQL_PARAMS = 999
+
+def bulk_insert(table, cols, rows):
+    """
+    Insert many rows with multi-row VALUES statements (<= 500 rows each)
+    inside a single transaction. `table`/`cols` are trusted identifiers.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    per_stmt = max(1, min(500, _MAX_SQL_PARAMS // len(cols)))
+    placeholders = "(" + ", ".join("?" * len(cols)) + ")"
+    with transaction() as cur:
+        for i in range(0, len(rows), per_stmt):
+            chunk = rows[i:i + per_stmt]
+            cur.execute(
+                f"INSERT INTO {table} ({', '.join(cols)}) VALUES {', '.join([placeholders] * len(chunk))}",
+                [v for row in chunk for v in row],
+            )
+    return len(rows)
+
 def init_db():
     conn = get_conn()
     cur = conn.cursor()
 
+    # WAL is stored in the database file, so it only needs setting once per
+    # process (see _setup_db); it lets readers continue while a write commits
+    # (one fsync per commit with synchronous=NORMAL, set in get_conn)
+    cur.execute("PRAGMA journal_mode=WAL")
+
     # users
     cur.execute(
         """
@@ -103,6 +216,7 @@ def init_db():
             decision TEXT,        -- bought, skipped
             decided_at TEXT,
             created_at TEXT NOT NULL,
+            updated_at TEXT,      -- bumped on every status change
             FOREIGN KEY(group_id) REFERENCES groups(id),
             FOREIGN KEY(user_id) REFERENCES users(id)
         );
@@ -151,17 +265,37 @@ def init_db():
         """
     )
 
-    conn.commit()
-    conn.close()
+    # posts.updated_at was added later: add + backfill it on older databases
+    post_cols = {r["name"] for r in cur.execute("PRAGMA table_info(posts)").fetchall()}
+    if "updated_at" not in post_cols:
+        cur.execute("ALTER TABLE posts ADD COLUMN updated_at TEXT")
+        cur.execute("UPDATE posts SET updated_at = COALESCE(decided_at, created_at)")
 
-# initialize DB
-init_db()
+    ensure_indexes(cur)
+
+def ensure_indexes(cur):
+    """
+    Indexes for the hot lookups. memberships(user_id) is already served by
+    the primary key; votes(post_id, vote) also covers the vote-count GROUP BY.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_group_created ON posts(group_id, created_at DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_group_updated ON posts(group_id, updated_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_user ON posts(user_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_status_deadline ON posts(status, deadline_utc)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_votes_post_vote ON votes(post_id, vote)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memberships_group ON memberships(group_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_post ON notifications(post_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_groups_owner ON groups(owner_id)")
 
 # ----------------------------
 # Utility functions
 # ----------------------------
+def now_utc():
+    return datetime.now(timezone.utc)
+
 def now_utc_iso() -> str:
-    return datetime.utcnow().isoformat()
+    # stored as naive UTC ISO strings, matching deadline_utc and existing rows
+    return now_utc().replace(tzinfo=None).isoformat()
 
 def to_local(iso_ts: str, tz_name: str = "Asia/Kolkata") -> str:
     try:
@@ -171,6 +305,24 @@ def to_local(iso_ts: str, tz_name: str = "Asia/Kolkata") -> str:
     except Exception:
         return iso_ts
 
+@st.cache_data(ttl=10)
+def upload_names():
+    """Filenames in UPLOAD_DIR: one directory read instead of a stat() per post."""
+    try:
+        return frozenset(e.name for e in os.scandir(UPLOAD_DIR))
+    except FileNotFoundError:
+        return frozenset()
+
+@st.cache_data(max_entries=256)
+def image_thumb(path: str) -> bytes:
+    """Card-sized JPEG bytes for an uploaded image (uploads are write-once {pid}.jpg)."""
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        img.thumbnail(THUMB_SIZE, Image.Resampling.LANCZOS)
+        buf = BytesIO()
+        img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
 def hash_password(pw: str) -> str:
     salt = "spendsense_salt_v1"
     return hashlib.sha256((pw + salt).encode()).hexdigest()
@@ -185,8 +337,6 @@ def ensure_savings_row(user_id: str):
         "INSERT OR IGNORE INTO savings (user_id, total_saved, updated_at) VALUES (?, 0, ?)",
         (user_id, now_utc_iso()),
     )
-    conn.commit()
-    conn.close()
 
 def backfill_savings_rows():
     conn = get_conn()
@@ -196,11 +346,16 @@ def backfill_savings_rows():
         "SELECT id, 0, ? FROM users",
         (now_utc_iso(),),
     )
-    conn.commit()
-    conn.close()
 
-# do a safe backfill on startup (idempotent)
-backfill_savings_rows()
+@st.cache_resource
+def _setup_db():
+    # schema, migrations and backfill once per process; Streamlit re-executes
+    # this file on every rerun, and cache_resource runs this only on first use
+    init_db()
+    backfill_savings_rows()
+    return True
+
+_setup_db()
 
 # ----------------------------
 # Email sending (optional)
@@ -215,9 +370,11 @@ def send_email(recipients, subject, body):
     user = "bdhanajeyahemanth@gmail.com"
     password = "zuzd sfan sdjw caqa"
     from_email = "SpendSense <bdhanajeyahemanth@gmail.com>"
+
+    The message is handed to a background sender and this returns at once.
     """
     try:
-        cfg = st.secrets["smtp"]
+        cfg = dict(st.secrets["smtp"])
     except Exception:
         return False, "SMTP not configured"
     try:
@@ -226,74 +383,124 @@ def send_email(recipients, subject, body):
         msg["From"] = cfg.get("from_email", cfg.get("user"))
         msg["To"] = ", ".join(recipients)
         msg.set_content(body)
-        with smtplib.SMTP(cfg["host"], int(cfg.get("port", 587))) as s:
-            s.starttls()
-            s.login(cfg["user"], cfg["password"])
-            s.send_message(msg)
-        return True, "sent"
+        _mail_queue().put((cfg, msg))
+        return True, "queued"
     except Exception as e:
         return False, str(e)
 
+def _mail_worker(q):
+    """Send queued messages, keeping one authenticated SMTP session open."""
+    smtp = None
+    while True:
+        cfg, msg = q.get()
+        for _ in range(2):
+            try:
+                if smtp is None:
+                    smtp = smtplib.SMTP(cfg["host"], int(cfg.get("port", 587)))
+                    smtp.starttls()
+                    smtp.login(cfg["user"], cfg["password"])
+                smtp.send_message(msg)
+                break
+            except smtplib.SMTPServerDisconnected:
+                # idle session dropped by the server: reconnect and retry once
+                smtp = None
+            except Exception:
+                # give up on this message; start a fresh session for the next one
+                try:
+                    smtp.close()
+                except Exception:
+                    pass
+                smtp = None
+                break
+        q.task_done()
+
+@st.cache_resource
+def _mail_queue():
+    # cache_resource: one queue + sender thread per process, not per script rerun
+    q = queue.Queue()
+    threading.Thread(target=_mail_worker, args=(q,), name="spendsense-mail", daemon=True).start()
+    return q
+
 # ----------------------------
 # Data access & logic
 # ----------------------------
+# SQL for the per-render / per-write hot paths. The connection's statement
+# cache is keyed by SQL text, so these always hit an already-prepared statement.
+_SQL_INSERT_POST = """
+    INSERT INTO posts (id, group_id, user_id, item_name, item_link, price, reason, image_path, deadline_utc, status, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?, ?)
+"""
+_SQL_INSERT_NOTIFICATION = "INSERT INTO notifications (id, group_id, post_id, type, created_at) VALUES (?, ?, ?, ?, ?)"
+# only the columns the post list renders; get_post() returns the full row
+_SQL_LIST_POSTS = """
+    SELECT id, group_id, user_id, item_name, item_link, price, reason, image_path,
+           deadline_utc, status, decision, created_at, updated_at
+    FROM posts WHERE group_id=? ORDER BY created_at DESC LIMIT ?
+"""
+_SQL_INSERT_VOTE = "INSERT INTO votes (id, post_id, user_id, vote, comment, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+_SQL_UPDATE_VOTE = "UPDATE votes SET vote=?, comment=?, created_at=? WHERE post_id=? AND user_id=?"
+_SQL_VOTE_COUNTS = """
+    SELECT v.user_id, v.vote, v.comment, v.created_at, u.name,
+           SUM(v.vote = 'buy') OVER () AS n_buy,
+           SUM(v.vote = 'dont_buy') OVER () AS n_dont_buy,
+           SUM(v.vote = 'neutral') OVER () AS n_neutral
+    FROM votes v
+    JOIN users u ON v.user_id = u.id
+    WHERE v.post_id=? ORDER BY v.created_at DESC LIMIT ?
+"""
+_SQL_GET_SAVINGS = "SELECT total_saved FROM savings WHERE user_id=?"
+
 def create_user(email, name, password):
-    conn = get_conn()
-    cur = conn.cursor()
     uid = str(uuid.uuid4())
+    now = now_utc_iso()
     try:
-        cur.execute(
-            "INSERT INTO users (id, email, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
-            (uid, email.lower().strip(), name.strip(), hash_password(password), now_utc_iso()),
-        )
-        conn.commit()
-        # ensure savings row exists
-        cur.execute(
-            "INSERT OR IGNORE INTO savings (user_id, total_saved, updated_at) VALUES (?, ?, ?)",
-            (uid, 0.0, now_utc_iso()),
-        )
-        conn.commit()
+        with transaction() as cur:
+            cur.execute(
+                "INSERT INTO users (id, email, name, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (uid, email.lower().strip(), name.strip(), hash_password(password), now),
+            )
+            # ensure savings row exists
+            cur.execute(
+                "INSERT OR IGNORE INTO savings (user_id, total_saved, updated_at) VALUES (?, ?, ?)",
+                (uid, 0.0, now),
+            )
         return uid
     except sqlite3.IntegrityError:
         return None
-    finally:
-        conn.close()
 
 def auth_user(email, password):
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT * FROM users WHERE email=?", (email.lower().strip(),))
     row = cur.fetchone()
-    conn.close()
     if not row:
         return None
     if row["password_hash"] == hash_password(password):
         return dict(row)
     return None
 
+@st.cache_data(ttl=30)
 def get_user(uid):
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT * FROM users WHERE id=?", (uid,))
     r = cur.fetchone()
-    conn.close()
     return dict(r) if r else None
 
 def create_group(owner_id, name, short_code=True):
-    conn = get_conn()
-    cur = conn.cursor()
     gid = str(uuid.uuid4())
+    now = now_utc_iso()
     invite = str(int(time.time()))[-6:] if short_code else uuid.uuid4().hex[:8].upper()
-    cur.execute(
-        "INSERT INTO groups (id, owner_id, name, invite_code, created_at) VALUES (?, ?, ?, ?, ?)",
-        (gid, owner_id, name.strip(), invite, now_utc_iso()),
-    )
-    cur.execute(
-        "INSERT OR IGNORE INTO memberships (user_id, group_id, joined_at) VALUES (?, ?, ?)",
-        (owner_id, gid, now_utc_iso()),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            "INSERT INTO groups (id, owner_id, name, invite_code, created_at) VALUES (?, ?, ?, ?, ?)",
+            (gid, owner_id, name.strip(), invite, now),
+        )
+        cur.execute(
+            "INSERT OR IGNORE INTO memberships (user_id, group_id, joined_at) VALUES (?, ?, ?)",
+            (owner_id, gid, now),
+        )
+    list_groups.clear()
     return gid
 
 def join_group(user_id, invite_code):
@@ -302,20 +509,18 @@ def join_group(user_id, invite_code):
     cur.execute("SELECT * FROM groups WHERE invite_code=?", (invite_code.strip().upper(),))
     g = cur.fetchone()
     if not g:
-        conn.close()
         return None, "Invalid invite code"
     try:
         cur.execute(
             "INSERT INTO memberships (user_id, group_id, joined_at) VALUES (?, ?, ?)",
             (user_id, g["id"], now_utc_iso()),
         )
-        conn.commit()
+        list_groups.clear()
         return g["id"], None
     except sqlite3.IntegrityError:
         return g["id"], None
-    finally:
-        conn.close()
 
+@st.cache_data(ttl=30)
 def list_groups(user_id):
     conn = get_conn()
     cur = conn.cursor()
@@ -329,15 +534,14 @@ def list_groups(user_id):
         (user_id,),
     )
     rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
     return rows
 
+@st.cache_data(ttl=30)
 def get_group(group_id):
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT * FROM groups WHERE id=?", (group_id,))
     r = cur.fetchone()
-    conn.close()
     return dict(r) if r else None
 
 def group_members(group_id):
@@ -352,167 +556,287 @@ def group_members(group_id):
         (group_id,),
     )
     rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
     return rows
 
 def create_post(group_id, user_id, item_name, item_link, price, reason, image_bytes, deadline_dt):
     image_path = None
     pid = str(uuid.uuid4())
+    now = now_utc_iso()
     if image_bytes is not None:
         image_path = os.path.join(UPLOAD_DIR, f"{pid}.jpg")
         try:
             img = Image.open(BytesIO(image_bytes))
-            img = img.convert("RGB")
-            img.save(image_path, format="JPEG", quality=85)
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            # phone photos are often 12 MP; nothing in the UI shows them that large
+            img.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
+            img.save(image_path, format="JPEG", quality=82, optimize=True, progressive=True)
+            upload_names.clear()
         except Exception:
             image_path = None
 
+    with transaction() as cur:
+        cur.execute(
+            _SQL_INSERT_POST,
+            (
+                pid,
+                group_id,
+                user_id,
+                item_name.strip(),
+                (item_link or '').strip(),
+                float(price),
+                (reason or '').strip(),
+                image_path,
+                deadline_dt.astimezone(tz.tzutc()).replace(tzinfo=None).isoformat(),
+                now,
+                now,
+            ),
+        )
+        cur.execute(
+            _SQL_INSERT_NOTIFICATION,
+            (str(uuid.uuid4()), group_id, pid, 'new_post', now),
+        )
+    return pid
+
+def list_posts(group_id, limit=None):
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO posts (id, group_id, user_id, item_name, item_link, price, reason, image_path, deadline_utc, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
-        """,
-        (
-            pid,
-            group_id,
-            user_id,
-            item_name.strip(),
-            (item_link or '').strip(),
-            float(price),
-            (reason or '').strip(),
-            image_path,
-            deadline_dt.astimezone(tz.tzutc()).replace(tzinfo=None).isoformat(),
-            now_utc_iso(),
-        ),
-    )
-    cur.execute(
-        "INSERT INTO notifications (id, group_id, post_id, type, created_at) VALUES (?, ?, ?, ?, ?)",
-        (str(uuid.uuid4()), group_id, pid, 'new_post', now_utc_iso()),
-    )
-    conn.commit()
-    conn.close()
-    return pid
+    # LIMIT -1 means no limit in SQLite
+    cur.execute(_SQL_LIST_POSTS, (group_id, -1 if limit is None else limit))
+    rows = [dict(r) for r in cur.fetchall()]
+    return rows
 
-def list_posts(group_id):
+def posts_version(group_id):
+    """Cheap change marker for a group's posts: (row count, latest updated_at)."""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*), MAX(updated_at) FROM posts WHERE group_id=?", (group_id,))
+    return tuple(cur.fetchone())
+
+@st.cache_data(ttl=30)
+def cached_list_posts(group_id, version, limit=None):
+    """
+    list_posts memoised per posts_version(); a write to the group changes the key.
+    Local display times are added here so they are converted once per version.
+    """
+    posts = list_posts(group_id, limit)
+    for p in posts:
+        p["_created_local"] = to_local(p["created_at"])
+        p["_deadline_local"] = to_local(p["deadline_utc"])
+    return posts
+
+@st.cache_data(ttl=60)
+def group_insights(group_id, version, last_n=10):
+    """Bought/skipped split of the group's last `last_n` decisions (cached per posts_version)."""
     conn = get_conn()
     cur = conn.cursor()
     cur.execute(
-        "SELECT * FROM posts WHERE group_id=? ORDER BY created_at DESC",
-        (group_id,),
+        """
+        SELECT decision, COUNT(*) FROM (
+            SELECT decision FROM posts
+            WHERE group_id=? AND status='decided'
+            ORDER BY created_at DESC LIMIT ?
+        ) GROUP BY decision
+        """,
+        (group_id, last_n),
     )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    by_decision = dict(cur.fetchall())
+    return {
+        "bought": by_decision.get("bought", 0),
+        "skipped": by_decision.get("skipped", 0),
+        "total": sum(by_decision.values()),
+    }
 
 def get_post(post_id):
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT * FROM posts WHERE id=?", (post_id,))
     r = cur.fetchone()
-    conn.close()
     return dict(r) if r else None
 
 def cast_vote(post_id, user_id, vote, comment):
+    now = now_utc_iso()
+    with transaction() as cur:
+        try:
+            cur.execute(
+                _SQL_INSERT_VOTE,
+                (str(uuid.uuid4()), post_id, user_id, vote, (comment or '').strip(), now),
+            )
+        except sqlite3.IntegrityError:
+            cur.execute(
+                _SQL_UPDATE_VOTE,
+                (vote, (comment or '').strip(), now, post_id, user_id),
+            )
+
+def vote_counts(post_id, limit=20):
+    """
+    Vote totals plus the latest `limit` votes in one query. Every row carries
+    the post-wide totals (window sums run before LIMIT), so a vote type that
+    is missing from the returned page is still counted.
+    """
     conn = get_conn()
     cur = conn.cursor()
-    try:
+    cur.execute(_SQL_VOTE_COUNTS, (post_id, limit))
+    rows = cur.fetchall()
+    counts = {"buy": 0, "dont_buy": 0, "neutral": 0}
+    if rows:
+        counts = {"buy": rows[0]["n_buy"], "dont_buy": rows[0]["n_dont_buy"], "neutral": rows[0]["n_neutral"]}
+    votes = [
+        {k: r[k] for k in r.keys() if k not in ("n_buy", "n_dont_buy", "n_neutral")}
+        for r in rows
+    ]
+    return counts, votes
+
+# ----------------------------
+# Bulk lookups for the post list (one query per kind, not per post)
+# ----------------------------
+def _chunked(ids, size=_MAX_SQL_PARAMS):
+    ids = list(dict.fromkeys(ids))
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def bulk_get_users(ids):
+    """user_id -> {id, email, name} for every id that exists."""
+    conn = get_conn()
+    cur = conn.cursor()
+    users = {}
+    for chunk in _chunked(ids):
         cur.execute(
-            "INSERT INTO votes (id, post_id, user_id, vote, comment, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (str(uuid.uuid4()), post_id, user_id, vote, (comment or '').strip(), now_utc_iso()),
+            f"SELECT id, email, name FROM users WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk,
         )
-    except sqlite3.IntegrityError:
+        users.update((r["id"], dict(r)) for r in cur.fetchall())
+    return users
+
+def bulk_vote_counts(post_ids):
+    """post_id -> {"buy", "dont_buy", "neutral"} counts, zeros included."""
+    conn = get_conn()
+    cur = conn.cursor()
+    counts = {pid: {"buy": 0, "dont_buy": 0, "neutral": 0} for pid in post_ids}
+    for chunk in _chunked(post_ids):
         cur.execute(
-            "UPDATE votes SET vote=?, comment=?, created_at=? WHERE post_id=? AND user_id=?",
-            (vote, (comment or '').strip(), now_utc_iso(), post_id, user_id),
+            f"SELECT post_id, vote, COUNT(*) FROM votes WHERE post_id IN ({','.join('?' * len(chunk))}) "
+            "GROUP BY post_id, vote",
+            chunk,
         )
-    conn.commit()
-    conn.close()
+        for pid, vote, n in cur.fetchall():
+            if vote in counts[pid]:
+                counts[pid][vote] = n
+    return counts
 
-def post_votes(post_id):
+def bulk_vote_lists(post_ids, limit=20):
+    """post_id -> latest `limit` votes (with voter name), newest first."""
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT v.*, u.name FROM votes v
-        JOIN users u ON v.user_id = u.id
-        WHERE v.post_id=? ORDER BY v.created_at DESC
-        """,
-        (post_id,),
-    )
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
-
-def vote_counts(post_id):
-    votes = post_votes(post_id)
-    counts = {"buy": 0, "dont_buy": 0, "neutral": 0}
-    for v in votes:
-        if v["vote"] in counts:
-            counts[v["vote"]] += 1
-    return counts, votes
+    votes = {pid: [] for pid in post_ids}
+    for chunk in _chunked(post_ids, _MAX_SQL_PARAMS - 1):
+        cur.execute(
+            f"""
+            SELECT post_id, user_id, vote, comment, created_at, name FROM (
+                SELECT v.post_id, v.user_id, v.vote, v.comment, v.created_at, u.name,
+                       ROW_NUMBER() OVER (PARTITION BY v.post_id ORDER BY v.created_at DESC) AS rn
+                FROM votes v
+                JOIN users u ON v.user_id = u.id
+                WHERE v.post_id IN ({','.join('?' * len(chunk))})
+            )
+            WHERE rn <= ? ORDER BY post_id, created_at DESC
+            """,
+            (*chunk, limit),
+        )
+        for r in cur.fetchall():
+            votes[r["post_id"]].append(dict(r))
+    return votes
 
-def close_if_due(post):
-    if post["status"] != "pending":
-        return False
-    try:
-        deadline = datetime.fromisoformat(post["deadline_utc"]).replace(tzinfo=tz.tzutc())
-    except Exception:
-        return False
-    if datetime.utcnow().replace(tzinfo=tz.tzutc()) >= deadline:
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute("UPDATE posts SET status='closed' WHERE id=?", (post["id"],))
+def sweep_due_posts(group_id=None):
+    """
+    Close every pending post whose deadline has passed, in one UPDATE, and
+    add a 'closed' notification for each. With group_id, only that group's
+    posts are swept. Runs at most once per SWEEP_INTERVAL_S per session and
+    scope. Returns the number of posts closed.
+    """
+    ts_key = f"_last_sweep_ts_{group_id or '*'}"
+    last = st.session_state.get(ts_key, 0.0)
+    if time.monotonic() - last < SWEEP_INTERVAL_S:
+        return 0
+    st.session_state[ts_key] = time.monotonic()
+    now = now_utc_iso()
+    where, args = "status='pending' AND deadline_utc <= ?", [now]
+    if group_id is not None:
+        where, args = "group_id=? AND " + where, [group_id, now]
+    with transaction() as cur:
         cur.execute(
-            "INSERT INTO notifications (id, group_id, post_id, type, created_at) VALUES (?, ?, ?, ?, ?)",
-            (str(uuid.uuid4()), post["group_id"], post["id"], 'closed', now_utc_iso()),
+            f"UPDATE posts SET status='closed', updated_at=? WHERE {where} RETURNING id, group_id",
+            (now, *args),
         )
-        conn.commit()
-        conn.close()
-        return True
-    return False
+        closed = cur.fetchall()
+        bulk_insert(
+            "notifications",
+            ("id", "group_id", "post_id", "type", "created_at"),
+            [(str(uuid.uuid4()), r["group_id"], r["id"], 'closed', now) for r in closed],
+        )
+    return len(closed)
 
 def decide_post(post_id, decision):
     """
     decision: 'bought' or 'skipped'
     If skipped, increments savings for the post owner by the post price.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "UPDATE posts SET status='decided', decision=?, decided_at=? WHERE id=?",
-        (decision, now_utc_iso(), post_id),
-    )
-    cur.execute("SELECT user_id, price FROM posts WHERE id=?", (post_id,))
-    r = cur.fetchone()
-    if r and decision == 'skipped':
-        owner_id, price = r[0], float(r[1])
-        cur.execute("SELECT total_saved FROM savings WHERE user_id=?", (owner_id,))
-        s = cur.fetchone()
-        current = float(s[0]) if s else 0.0
-        new_total = current + price
+    now = now_utc_iso()
+    new_total = None
+    with transaction() as cur:
+        # RETURNING / upsert need SQLite >= 3.35
         cur.execute(
-            "INSERT OR REPLACE INTO savings (user_id, total_saved, updated_at) VALUES (?, ?, ?)",
-            (owner_id, new_total, now_utc_iso()),
+            "UPDATE posts SET status='decided', decision=?, decided_at=?, updated_at=? WHERE id=? "
+            "RETURNING user_id, price",
+            (decision, now, now, post_id),
         )
-    conn.commit()
-    conn.close()
+        r = cur.fetchone()
+        if r and decision == 'skipped':
+            cur.execute(
+                """
+                INSERT INTO savings (user_id, total_saved, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    total_saved = total_saved + excluded.total_saved,
+                    updated_at = excluded.updated_at
+                RETURNING total_saved
+                """,
+                (r[0], float(r[1]), now),
+            )
+            new_total = float(cur.fetchone()[0])
+    if new_total is not None:
+        # write-through so the sidebar never re-reads savings from the DB;
+        # savings only grow, so a late writer must not replace a newer total
+        store = _savings_store()
+        with _savings_lock():
+            store[r[0]] = max(store.get(r[0], 0.0), new_total)
+    invalidate_purchase_history()
+
+@st.cache_resource
+def _savings_store():
+    """Process-wide user_id -> total_saved; the DB stays the source of truth."""
+    return {}
+
+@st.cache_resource
+def _savings_lock():
+    return threading.Lock()
 
 def get_savings(user_id):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT total_saved FROM savings WHERE user_id=?", (user_id,))
-    r = cur.fetchone()
-    conn.close()
-    return float(r[0]) if r else 0.0
-
+    store = _savings_store()
+    total = store.get(user_id)
+    if total is None:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute(_SQL_GET_SAVINGS, (user_id,))
+        r = cur.fetchone()
+        # a decide_post() that committed after our read has already stored a
+        # newer total; keep it rather than overwrite it with this one
+        total = store.setdefault(user_id, float(r[0]) if r else 0.0)
+    return total
+
+@functools.lru_cache(maxsize=128)
 def badge_for(total_saved: float):
-    earned = None
-    for thr, name in BADGES:
-        if total_saved >= thr:
-            earned = name
-    return earned
+    # BADGES is sorted by threshold: the highest threshold <= total wins
+    i = bisect_right(_BADGE_THR, total_saved)
+    return _BADGE_NAME[i - 1] if i else None
 
 def notify_group_new_post(group_id, post, creator_name):
     members = group_members(group_id)
@@ -534,40 +858,70 @@ def notify_group_new_post(group_id, post, creator_name):
 # ----------------------------
 # Auto-suggestion (fixed)
 # ----------------------------
-from difflib import get_close_matches, SequenceMatcher
+from rapidfuzz import process, fuzz
 
-def check_purchase_history(user_id, item_name, threshold=0.7):
+@st.cache_data(ttl=300)
+def _past_items(user_id):
     """
-    Check if the user has bought similar items before.
-    Uses both get_close_matches and SequenceMatcher for similarity detection.
+    Items the user has marked as bought (cached per user), as two parallel
+    tuples: the original names and their lowercased forms for matching.
     """
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT item_name FROM posts WHERE user_id=? AND decision='bought'", (user_id,))
-    rows = cur.fetchall()
-    conn.close()
+    names = tuple(r[0].strip() for r in cur.fetchall() if r[0] and r[0].strip())
+    return names, tuple(n.lower() for n in names)
+
+def bulk_past_items(user_ids):
+    """
+    Same as _past_items for many users in one query:
+    user_id -> (names, lowercased names); users without history map to empty tuples.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    user_ids = list(dict.fromkeys(user_ids))
+    names = {uid: [] for uid in user_ids}
+    for chunk in _chunked(user_ids):
+        cur.execute(
+            f"SELECT user_id, item_name FROM posts WHERE decision='bought' "
+            f"AND user_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for uid, item in cur.fetchall():
+            if item and item.strip():
+                names[uid].append(item.strip())
+    return {uid: (tuple(n), tuple(x.lower() for x in n)) for uid, n in names.items()}
+
+def invalidate_purchase_history():
+    _past_items.clear()
+    check_purchase_history.clear()
+
+@st.cache_data(ttl=60)
+def check_purchase_history(user_id, item_name, threshold=0.7):
+    """
+    Check if the user has bought similar items before.
+    Uses rapidfuzz's QRatio (normalised edit-distance similarity) in one pass.
+    Results are memoised per (user_id, item_name, threshold), so form reruns
+    with the same text don't hit the DB again.
+    """
+    past_items, past_items_norm = _past_items(user_id)
+    return match_purchase_history(past_items, past_items_norm, item_name, threshold)
 
-    past_items = [r[0].strip() for r in rows if r[0] and r[0].strip()]
+def match_purchase_history(past_items, past_items_norm, item_name, threshold=0.7):
+    """Fuzzy-match item_name against already-fetched history (see _past_items)."""
     if not past_items:
         return "✅ No bought history found — this might be a new need."
 
-    # Normalize case and spaces for comparison
+    # Normalize case and spaces for comparison (history is pre-normalised)
     item_name_norm = item_name.lower().strip()
-    past_items_norm = [p.lower().strip() for p in past_items]
 
-    # Try get_close_matches first
-    matches = get_close_matches(item_name_norm, past_items_norm, n=1, cutoff=threshold)
-    if matches:
-        matched = matches[0]
-        original = next((p for p in past_items if p.lower().strip() == matched), matched)
+    match = process.extractOne(
+        item_name_norm, past_items_norm, scorer=fuzz.QRatio, score_cutoff=threshold * 100
+    )
+    if match:
+        original = past_items[match[2]]
         return f"⚠️ Suggestion: You already bought something similar earlier: '{original}'. Consider skipping."
 
-    # Fallback using SequenceMatcher
-    for past, norm_past in zip(past_items, past_items_norm):
-        ratio = SequenceMatcher(None, norm_past, item_name_norm).ratio()
-        if ratio >= threshold:
-            return f"⚠️ Suggestion: You already bought something similar earlier: '{past}'. Consider skipping."
-
     return "✅ No bought history found — this might be a new need."
 
 # ----------------------------
@@ -580,23 +934,21 @@ def delete_post(post_id, user_id):
     cur.execute("SELECT user_id, image_path, status FROM posts WHERE id=?", (post_id,))
     r = cur.fetchone()
     if not r or r["user_id"] != user_id:
-        conn.close()
         return False
     if r["status"] != "pending":
         # allow deletion only for pending posts (you can adjust policy)
-        conn.close()
         return False
     image_path = r["image_path"]
-    cur.execute("DELETE FROM votes WHERE post_id=?", (post_id,))
-    cur.execute("DELETE FROM notifications WHERE post_id=?", (post_id,))
-    cur.execute("DELETE FROM posts WHERE id=?", (post_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute("DELETE FROM votes WHERE post_id=?", (post_id,))
+        cur.execute("DELETE FROM notifications WHERE post_id=?", (post_id,))
+        cur.execute("DELETE FROM posts WHERE id=?", (post_id,))
     if image_path and os.path.exists(image_path):
         try:
             os.remove(image_path)
         except Exception:
             pass
+        upload_names.clear()
     return True
 
 def delete_group(group_id, user_id):
@@ -606,26 +958,32 @@ def delete_group(group_id, user_id):
     cur.execute("SELECT owner_id FROM groups WHERE id=?", (group_id,))
     g = cur.fetchone()
     if not g or g["owner_id"] != user_id:
-        conn.close()
         return False
-    # remove posts, votes, notifications, memberships
-    cur.execute("SELECT id, image_path FROM posts WHERE group_id=?", (group_id,))
-    posts = cur.fetchall()
-    for p in posts:
-        pid = p["id"]
-        path = p["image_path"]
-        cur.execute("DELETE FROM votes WHERE post_id=?", (pid,))
-        cur.execute("DELETE FROM notifications WHERE post_id=?", (pid,))
+    # remove posts, votes, notifications, memberships in one transaction
+    cur.execute("SELECT image_path FROM posts WHERE group_id=?", (group_id,))
+    image_paths = [r["image_path"] for r in cur.fetchall()]
+    with transaction() as cur:
+        cur.execute(
+            "DELETE FROM votes WHERE post_id IN (SELECT id FROM posts WHERE group_id=?)",
+            (group_id,),
+        )
+        cur.execute(
+            "DELETE FROM notifications WHERE post_id IN (SELECT id FROM posts WHERE group_id=?)",
+            (group_id,),
+        )
+        cur.execute("DELETE FROM posts WHERE group_id=?", (group_id,))
+        cur.execute("DELETE FROM memberships WHERE group_id=?", (group_id,))
+        cur.execute("DELETE FROM groups WHERE id=?", (group_id,))
+    list_groups.clear()
+    get_group.clear()
+    invalidate_purchase_history()
+    for path in image_paths:
         try:
             if path and os.path.exists(path):
                 os.remove(path)
         except Exception:
             pass
-    cur.execute("DELETE FROM posts WHERE group_id=?", (group_id,))
-    cur.execute("DELETE FROM memberships WHERE group_id=?", (group_id,))
-    cur.execute("DELETE FROM groups WHERE id=?", (group_id,))
-    conn.commit()
-    conn.close()
+    upload_names.clear()
     return True
 
 def clear_user_data(user_id):
@@ -646,17 +1004,130 @@ def clear_user_data(user_id):
                 os.remove(path)
         except Exception:
             pass
-    cur.execute("DELETE FROM votes WHERE user_id=?", (user_id,))
-    cur.execute("DELETE FROM posts WHERE user_id=?", (user_id,))
-    cur.execute("DELETE FROM memberships WHERE user_id=?", (user_id,))
-    cur.execute("DELETE FROM savings WHERE user_id=?", (user_id,))
-    cur.execute("DELETE FROM users WHERE id=?", (user_id,))
-    conn.commit()
-    conn.close()
+    upload_names.clear()
+    with transaction() as cur:
+        cur.execute("DELETE FROM votes WHERE user_id=?", (user_id,))
+        cur.execute("DELETE FROM posts WHERE user_id=?", (user_id,))
+        cur.execute("DELETE FROM memberships WHERE user_id=?", (user_id,))
+        cur.execute("DELETE FROM savings WHERE user_id=?", (user_id,))
+        cur.execute("DELETE FROM users WHERE id=?", (user_id,))
+    get_user.clear()
+    list_groups.clear()
+    _savings_store().pop(user_id, None)
+    invalidate_purchase_history()
 
 # ----------------------------
 # Streamlit UI
 # ----------------------------
+# resolved once: st.rerun on current Streamlit, experimental_rerun on old ones
+_rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+@st.fragment
+def render_post(p, u, poster_name, counts, votes_list, poster_history, has_image):
+    """
+    One post card. Runs as a fragment, so submitting a vote reruns only this
+    card; decisions and deletes still rerun the whole page (savings, list).
+    """
+    # fields used repeatedly below, looked up once
+    pid, poster_id, item_name, status = p["id"], p["user_id"], p["item_name"], p["status"]
+
+    # fragment reruns reuse the arguments of the last full run, so a card
+    # voted on since then refetches its own counts until the next full run
+    if pid in st.session_state.get("posts_dirty", ()):
+        counts, votes_list = vote_counts(pid)
+
+    with st.container():
+        cols = st.columns([1.2, 3, 1.2])
+        with cols[0]:
+            if has_image:
+                try:
+                    thumb = image_thumb(p["image_path"])
+                    st.image(thumb, use_container_width=True)
+                except OSError:
+                    pass
+            st.caption(f"Posted: {p['_created_local']} IST  \nBy: {poster_name}")
+
+        with cols[1]:
+            # single-line card text is merged into few markdown elements; the
+            # multi-line reason stays its own element so its markup (e.g. an
+            # unclosed ``` fence) cannot swallow the deadline and vote tally
+            md = [f"### {item_name}", f"**Price:** ₹{p['price']:,.0f}"]
+            if p.get("item_link"):
+                md.append(f"Link: {p['item_link']}")
+            st.markdown("\n\n".join(md))
+            if p.get("reason"):
+                st.write(f"Reason: {p['reason']}")
+            st.markdown(
+                f"**Deadline:** {p['_deadline_local']} IST\n\n"
+                f"**Votes →** ✅ Buy: {counts['buy']} | ❌ Don't Buy: {counts['dont_buy']} | 😐 Neutral: {counts['neutral']}"
+            )
+
+            # show poster suggestion to group
+            try:
+                poster_suggestion = match_purchase_history(*poster_history, item_name)
+                if poster_suggestion and poster_suggestion.startswith("⚠️"):
+                    st.warning(f"(Poster history) {poster_suggestion}")
+            except Exception:
+                pass
+
+        if status == "pending":
+            if u["id"] != poster_id:
+                form_key = f"vote_form_{pid}_{u['id']}"  # Unique key for each user & post
+                with st.form(form_key):
+                    vote = st.radio("Your vote", ["buy", "dont_buy", "neutral"], index=0, horizontal=True)
+                    comment = st.text_input("Comment (optional)", "",key=f"comment_{pid}")
+                    vbtn = st.form_submit_button("Submit vote")
+                    if vbtn:
+                        cast_vote(pid, u["id"], vote, comment)
+                        st.success("Vote recorded!")
+                        # only this card changed: rerun the fragment with fresh counts
+                        st.session_state.posts_dirty.add(pid)
+                        st.rerun(scope="fragment")
+                    st.info("You can finalize decision anytime.")
+
+            elif status == "closed":
+                st.warning("Voting closed. Awaiting final decision from poster.")
+            elif status == "decided":
+                if p["decision"] == "skipped":
+                    st.success("Final decision: Skipped ✅ (Saved money)")
+                else:
+                    st.info("Final decision: Bought 🛍️")
+
+            # expander bodies run even when collapsed; build the list only when ticked
+            if st.checkbox("🗨️ See all feedback", key=f"fb_{pid}"):
+                if votes_list:
+                    for v in votes_list:
+                        st.write(f"**{v['name']}** → {v['vote']}")
+                        if v.get("comment"):
+                            st.caption(v["comment"])
+                    total_votes = sum(counts.values())
+                    if total_votes > len(votes_list):
+                        st.caption(f"Showing the latest {len(votes_list)} of {total_votes} votes.")
+                else:
+                    st.caption("No votes yet.")
+
+        with cols[2]:
+            # Poster-only final decision or delete
+            if poster_id == u["id"]:
+                st.write("**Make final decision**")
+                dcol1, dcol2 = st.columns(2)
+                if dcol1.button("I bought it", key=f"buy_{pid}"):
+                    decide_post(pid, "bought")
+                    _rerun()
+                if dcol2.button("I skipped it", key=f"skip_{pid}"):
+                    decide_post(pid, "skipped")
+                    _rerun()
+                if st.button("🗑️ Delete Post", key=f"del_{pid}"):
+                    ok = delete_post(pid, u["id"])
+                    if ok:
+                        st.success("Post deleted.")
+                    else:
+                        st.error("Cannot delete this post (must be pending and your own).")
+                    _rerun()
+            else:
+                # For non-poster users, optionally show a 'flag' or contact
+                pass
+
 # Initialize session keys
 if "user" not in st.session_state:
     st.session_state.user = None
@@ -686,7 +1157,7 @@ if st.session_state.user is None:
                 st.session_state.user = get_user(uid)
                 ensure_savings_row(st.session_state.user["id"])
                 st.success("Account created & logged in!")
-                st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                _rerun()
             else:
                 st.error("Email already registered.")
         else:
@@ -695,7 +1166,7 @@ if st.session_state.user is None:
                 st.session_state.user = u
                 ensure_savings_row(u["id"])
                 st.success("Logged in!")
-                st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                _rerun()
             else:
                 st.error("Invalid credentials.")
 
@@ -709,7 +1180,7 @@ if st.session_state.user:
     if st.sidebar.button("Logout"):
         st.session_state.user = None
         st.session_state.active_gid = None
-        st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+        _rerun()
 
     # Sidebar: Groups
     st.sidebar.subheader("Your Groups")
@@ -732,7 +1203,7 @@ if st.session_state.user:
             if gname.strip():
                 gid = create_group(u["id"], gname, short_code)
                 st.success("Group created!")
-                st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                _rerun()
             else:
                 st.error("Enter a group name.")
 
@@ -747,7 +1218,7 @@ if st.session_state.user:
                     st.error(err)
                 else:
                     st.success("Joined!")
-                    st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                    _rerun()
 
     # Sidebar: Progress & badges
     st.sidebar.subheader("🏆 Your Progress")
@@ -764,7 +1235,7 @@ if st.session_state.user:
             st.success("Your account and all data were deleted.")
             st.session_state.user = None
             st.session_state.active_gid = None
-            st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+            _rerun()
 
     # Main content: group selected?
     if not st.session_state.active_gid:
@@ -784,7 +1255,7 @@ if st.session_state.user:
                     if delete_group(active_gid, u["id"]):
                         st.success("Group deleted.")
                         st.session_state.active_gid = None
-                        st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                        _rerun()
                     else:
                         st.error("Failed to delete group.")
 
@@ -828,7 +1299,7 @@ if st.session_state.user:
                 if not item_name or price <= 0:
                     st.error("Please provide item name and a valid price.")
                 else:
-                    deadline_dt = datetime.utcnow().replace(tzinfo=tz.tzutc()) + timedelta(hours=deadline_hours)
+                    deadline_dt = now_utc() + timedelta(hours=deadline_hours)
                     img_bytes = image.read() if image else None
                     pid = create_post(active_gid, u["id"], item_name, item_link, price, reason, img_bytes, deadline_dt)
                     p = get_post(pid)
@@ -839,120 +1310,63 @@ if st.session_state.user:
                             notify_group_new_post(active_gid, p, u["name"])
                             st.success("Posted and recorded as SKIPPED — savings & badge updated.")
                             st.session_state.post_auto_skip = False
-                            st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                            _rerun()
                         else:
                             notify_group_new_post(active_gid, p, u["name"])
                             st.success("Posted! Group notified (if email configured).")
-                            st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                            _rerun()
                     except Exception as e:
                         notify_group_new_post(active_gid, p, u["name"])
                         st.error(f"Posted but failed to finalize skip automatically: {e}")
-                        st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
+                        _rerun()
 
         st.markdown("---")
         st.subheader("Recent posts in this group")
 
-        posts = list_posts(active_gid)
+        # auto-close this group's overdue posts before listing
+        sweep_due_posts(active_gid)
+        # newest POSTS_PAGE_SIZE first; "Load more" grows the window per group
+        shown_key = f"posts_shown_{active_gid}"
+        posts_shown = st.session_state.get(shown_key, POSTS_PAGE_SIZE)
+        posts_ver = posts_version(active_gid)
+        # one extra row tells us whether there is anything left to load
+        posts = cached_list_posts(active_gid, posts_ver, posts_shown + 1)
+        has_more = len(posts) > posts_shown
+        posts = posts[:posts_shown]
         if not posts:
             st.info("No posts yet. Create one above.")
         else:
+            post_ids = [p["id"] for p in posts]
+            users_by_id = bulk_get_users(p["user_id"] for p in posts)
+            counts_by_post = bulk_vote_counts(post_ids)
+            votes_by_post = bulk_vote_lists(post_ids)
+            history_by_user = bulk_past_items(p["user_id"] for p in posts)
+            existing_uploads = upload_names()
+            # counts above are fresh for every card; see render_post
+            st.session_state.posts_dirty = set()
             for p in posts:
-                # auto-close if due
-                if close_if_due(p):
-                    p = get_post(p["id"])
-
-                with st.container():
-                    cols = st.columns([1.2, 3, 1.2])
-                    with cols[0]:
-                        if p.get("image_path") and os.path.exists(p["image_path"]):
-                            st.image(p["image_path"], use_container_width=True)
-                        st.caption(f"Posted: {to_local(p['created_at'])} IST")
-                        poster = get_user(p['user_id'])
-                        poster_name = poster['name'] if poster else "Unknown"
-                        st.caption(f"By: {poster_name}")
-
-                    with cols[1]:
-                        st.subheader(p["item_name"])
-                        st.write(f"**Price:** ₹{p['price']:,.0f}")
-                        if p.get("item_link"):
-                            st.write(f"Link: {p['item_link']}")
-                        if p.get("reason"):
-                            st.write(f"Reason: {p['reason']}")
-                        st.write(f"**Deadline:** {to_local(p['deadline_utc'])} IST")
-
-                        counts, votes_list = vote_counts(p["id"])
-                        st.write(
-                            f"**Votes →** ✅ Buy: {counts['buy']} | ❌ Don't Buy: {counts['dont_buy']} | 😐 Neutral: {counts['neutral']}"
-                        )
-
-                        # show poster suggestion to group
-                        try:
-                            poster_suggestion = check_purchase_history(p['user_id'], p['item_name'])
-                            if poster_suggestion and poster_suggestion.startswith("⚠️"):
-                                st.warning(f"(Poster history) {poster_suggestion}")
-                        except Exception:
-                            pass
-
-                    if p["status"] == "pending":
-                        if u["id"] != p["user_id"]:
-                            form_key = f"vote_form_{p['id']}_{u['id']}"  # Unique key for each user & post
-                            with st.form(form_key):
-                                vote = st.radio("Your vote", ["buy", "dont_buy", "neutral"], index=0, horizontal=True)
-                                comment = st.text_input("Comment (optional)", "",key=f"comment_{p['id']}")
-                                vbtn = st.form_submit_button("Submit vote")
-                                if vbtn:
-                                    cast_vote(p["id"], u["id"], vote, comment)
-                                    st.success("Vote recorded!")
-                                    # Refresh the post and UI after vote submission
-                                    st.rerun()
-                                st.info("You can finalize decision anytime.")
-    
-                        elif p["status"] == "closed":
-                            st.warning("Voting closed. Awaiting final decision from poster.")
-                        elif p["status"] == "decided":
-                            if p["decision"] == "skipped":
-                                st.success("Final decision: Skipped ✅ (Saved money)")
-                            else:
-                                st.info("Final decision: Bought 🛍️")
-    
-                        with st.expander("🗨️ See all feedback"):
-                            if votes_list:
-                                for v in votes_list:
-                                    st.write(f"**{v['name']}** → {v['vote']}")
-                                    if v.get("comment"):
-                                        st.caption(v["comment"])
-                            else:
-                                st.caption("No votes yet.")
-
-                    with cols[2]:
-                        # Poster-only final decision or delete
-                        if p["user_id"] == u["id"]:
-                            st.write("**Make final decision**")
-                            dcol1, dcol2 = st.columns(2)
-                            if dcol1.button("I bought it", key=f"buy_{p['id']}"):
-                                decide_post(p["id"], "bought")
-                                st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
-                            if dcol2.button("I skipped it", key=f"skip_{p['id']}"):
-                                decide_post(p["id"], "skipped")
-                                st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
-                            if st.button("🗑️ Delete Post", key=f"del_{p['id']}"):
-                                ok = delete_post(p["id"], u["id"])
-                                if ok:
-                                    st.success("Post deleted.")
-                                else:
-                                    st.error("Cannot delete this post (must be pending and your own).")
-                                st.rerun() if hasattr(st, "experimental_rerun") else st.rerun()
-                        else:
-                            # For non-poster users, optionally show a 'flag' or contact
-                            pass
+                poster = users_by_id.get(p["user_id"])
+                render_post(
+                    p,
+                    u,
+                    poster["name"] if poster else "Unknown",
+                    counts_by_post[p["id"]],
+                    votes_by_post[p["id"]],
+                    history_by_user[p["user_id"]],
+                    bool(p.get("image_path")) and os.path.basename(p["image_path"]) in existing_uploads,
+                )
+
+            if has_more and st.button("Load more", key=f"load_more_{active_gid}"):
+                st.session_state[shown_key] = posts_shown + POSTS_PAGE_SIZE
+                _rerun()
 
         st.markdown("---")
         st.subheader("📊 Group Insights")
-        decided_posts = [pp for pp in posts if pp["status"] == "decided"][:10]
-        if decided_posts:
-            bought = sum(1 for pp in decided_posts if pp["decision"] == "bought")
-            skipped = sum(1 for pp in decided_posts if pp["decision"] == "skipped")
-            st.write(f"Last {len(decided_posts)} decisions → **Bought:** {bought} | **Skipped:** {skipped}")
+        insights = group_insights(active_gid, posts_ver)
+        if insights["total"]:
+            st.write(
+                f"Last {insights['total']} decisions → **Bought:** {insights['bought']} | **Skipped:** {insights['skipped']}"
+            )
         else:
             st.caption("No decided posts yet.")
 